@@ -8,6 +8,7 @@ from .schemas import (
     VoteScores, NeighborInfo, TokenSaliency,
     HealthResponse,
     ExplainRequest, ExplainResponse,
-    
+    LabelEnum,
+    SpamSubcategoryEnum,
 )
 from .routes import classifier, health, explain
\ No newline at end of file
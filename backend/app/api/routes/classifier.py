@@ -3,15 +3,20 @@ Classification API endpoints
 """
 
 from fastapi import APIRouter, HTTPException, Request, Depends
+import asyncio
+import numpy as np
 import time
 import logging
+from typing import List, Optional
 
 from app.api import (
     ClassifyRequest, ClassifyResponse, 
     BatchClassifyRequest, BatchClassifyResponse,
-    VoteScores, NeighborInfo, TokenSaliency
+    VoteScores, NeighborInfo, TokenSaliency,
+    LabelEnum, SpamSubcategoryEnum
 )
-from app.services import ModelService
+from app.services import ModelService, EmbeddingBatcher
+from app.services.metadata_store import LABEL_NAMES
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -21,10 +26,75 @@ def get_model_service(request: Request) -> ModelService:
     """Dependency to get model service instance."""
     return request.app.state.model_service
 
+def get_embedding_batcher(request: Request) -> EmbeddingBatcher:
+    """Dependency to get embedding batcher instance."""
+    return request.app.state.embedding_batcher
+
+def _construct_neighbor(neighbor: dict) -> NeighborInfo:
+    """Build a NeighborInfo from trusted service output without validation."""
+    return NeighborInfo.model_construct(**{**neighbor, "label": LabelEnum(neighbor["label"])})
+
+def _do_classify(
+    model_service: ModelService,
+    message: str,
+    result: dict,
+    k: int,
+    explain: bool,
+    start_time: float
+) -> dict:
+    """Assemble the response fields for a weighted KNN result as a plain dict."""
+    # Get subcategory if spam
+    subcategory = None
+    if result['prediction'] == 'spam':
+        subcategory = SpamSubcategoryEnum(model_service.classify_spam_subcategory(message))
+        
+    # Get token saliency if requested
+    tokens = None
+    if explain:
+        token_saliencies = model_service.compute_token_saliency(
+            text=message,
+            k=k
+        )
+        # Service output is trusted, skip re-validation
+        tokens = [TokenSaliency.model_construct(**ts) for ts in token_saliencies]
+        
+    processing_time = (time.time() - start_time) * 1000  # in ms
+    return {
+        "prediction": LabelEnum(result['prediction']),
+        "is_spam": result['prediction'] == 'spam',
+        "confidence": result['confidence'],
+        "vote_scores": VoteScores.model_construct(**result['vote_scores']),
+        "subcategory": subcategory,
+        "saliency_weight": result['saliency_weight'],
+        "alpha": result['alpha'],
+        "neighbors": [_construct_neighbor(n) for n in result['neighbors']],
+        "tokens": tokens,
+        "processing_time_ms": processing_time
+    }
+
+def _do_classify_batch(
+    model_service: ModelService,
+    messages: List[str],
+    k: int,
+    alpha: Optional[float],
+    explain: bool,
+    start_time: float
+) -> List[ClassifyResponse]:
+    """Classify a batch and build responses in one pass without re-validating trusted fields."""
+    # Single embedding pass and FAISS search for all messages
+    results = model_service.classify_weighted_knn_batch(messages, k, alpha)
+    return [
+        ClassifyResponse.model_construct(
+            **_do_classify(model_service, message, result, k, explain, start_time)
+        )
+        for message, result in zip(messages, results)
+    ]
+
 @router.post("/classify", response_model=ClassifyResponse)
 async def classify_message(
     req: ClassifyRequest,
-    model_service: ModelService = Depends(get_model_service)
+    model_service: ModelService = Depends(get_model_service),
+    embedding_batcher: EmbeddingBatcher = Depends(get_embedding_batcher)
 ):
     """
     Classify a single message as spam or ham
@@ -38,41 +108,17 @@ async def classify_message(
     
     try:
         
-        #Perform classification
-        result = model_service.classify_weighted_knn(
-            text=req.message,
-            k=req.k,
-            alpha=req.alpha,
+        # Embed together with concurrent requests, then classify off the event loop
+        query_embedding = await embedding_batcher.embed(req.message)
+        result = await asyncio.to_thread(
+            model_service.classify_weighted_knn,
+            req.message, req.k, req.alpha, query_embedding
         )
-        
-        # Get subcategory if spam
-        subcategory = None
-        if result['prediction'] == 'spam':
-            subcategory = model_service.classify_spam_subcategory(req.message)
-            
-        # Get token saliency if requested
-        tokens = None
-        if req.explain:
-            token_saliencies = model_service.compute_token_saliency(
-                text=req.message,
-                k=req.k
-            )
-            tokens = [TokenSaliency(**ts) for ts in token_saliencies]
-            
-        # Build response
-        processing_time = (time.time() - start_time) * 1000  # in ms
-        response = ClassifyResponse(
-            prediction=result['prediction'],
-            is_spam=(result['prediction'] == 'spam'),
-            confidence=result['confidence'],
-            vote_scores=VoteScores(**result['vote_scores']),
-            subcategory=subcategory,
-            saliency_weight=result['saliency_weight'],
-            alpha=result['alpha'],
-            neighbors=[NeighborInfo(**n) for n in result['neighbors']],
-            tokens=tokens,
-            processing_time_ms=processing_time
+        raw = await asyncio.to_thread(
+            _do_classify,
+            model_service, req.message, result, req.k, req.explain, start_time
         )
+        response = ClassifyResponse(**raw)
         logger.info(f"Classified message: {result['prediction']} (confidence: {result['confidence']:.3f})")
         return response
             
@@ -97,20 +143,12 @@ async def classify_batch(
     start_time = time.time()
     
     try:
-        results = []
-        
-        for message in req.messages:
-            # Create individual request
-            single_req = ClassifyRequest(
-                message=message,
-                k=req.k,
-                alpha=req.alpha,
-                explain=req.explain
-            )
-            
-            # Classify message
-            result = await classify_message(single_req, model_service)
-            results.append(result)
+        # Messages are already stripped and length-checked by BatchClassifyRequest;
+        # the whole batch is handled in one worker thread hop
+        results = await asyncio.to_thread(
+            _do_classify_batch,
+            model_service, req.messages, req.k, req.alpha, req.explain, start_time
+        )
             
         processing_time = (time.time() - start_time) * 1000  # in ms
         
@@ -137,10 +175,8 @@ async def get_statistics(
         total_samples = len(model_service.train_metadata)
         
         # Count label distribution
-        label_counts = {}
-        for item in model_service.train_metadata:
-            label = item['label']
-            label_counts[label] = label_counts.get(label, 0) + 1
+        counts = np.bincount(model_service.train_metadata.labels, minlength=len(LABEL_NAMES))
+        label_counts = dict(zip(LABEL_NAMES, counts.tolist()))
             
         return {
             "total_training_samples": total_samples,
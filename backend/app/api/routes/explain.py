@@ -3,12 +3,13 @@ Explainability endpoints.
 """
 
 from fastapi import APIRouter, Request, Depends, HTTPException
+import asyncio
 import logging
 from app.api import (
     ExplainResponse, ExplainRequest,
-    NeighborInfo, TokenSaliency
+    NeighborInfo, TokenSaliency, LabelEnum
 )
-from app.services import ModelService
+from app.services import ModelService, EmbeddingBatcher
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -17,22 +18,30 @@ def get_model_service(request: Request) -> ModelService:
     """Dependency to get model service instance."""
     return request.app.state.model_service
 
+def get_embedding_batcher(request: Request) -> EmbeddingBatcher:
+    """Dependency to get embedding batcher instance."""
+    return request.app.state.embedding_batcher
+
 @router.post("/explain", response_model=ExplainResponse)
 async def explain_prediction(
     req: ExplainRequest,
-    model_service: ModelService = Depends(get_model_service)
+    model_service: ModelService = Depends(get_model_service),
+    embedding_batcher: EmbeddingBatcher = Depends(get_embedding_batcher)
 ):
     """Get detailed explainability for message prediction."""
     try:
-        result = model_service.classify_weighted_knn(
-            text=req.message,
-            k=req.k
+        # Run blocking inference off the event loop
+        query_embedding = await embedding_batcher.embed(req.message)
+        result = await asyncio.to_thread(
+            model_service.classify_weighted_knn,
+            req.message, req.k, None, query_embedding
         )
-        token_saliencies = model_service.compute_token_saliency(
-            text=req.message,
-            k=req.k
+        token_saliencies = await asyncio.to_thread(
+            model_service.compute_token_saliency,
+            req.message, req.k
         )
-        tokens = [TokenSaliency(**ts) for ts in token_saliencies]
+        # Service output is trusted, skip re-validation
+        tokens = [TokenSaliency.model_construct(**ts) for ts in token_saliencies]
 
         spam_indicators = []
         ham_indicators = []
@@ -59,7 +68,10 @@ async def explain_prediction(
             message=req.message,
             prediction=result['prediction'],
             tokens=tokens,
-            top_neighbors=[NeighborInfo(**n) for n in result['neighbors'][:5]],
+            top_neighbors=[
+                NeighborInfo.model_construct(**{**n, "label": LabelEnum(n["label"])})
+                for n in result['neighbors'][:5]
+            ],
             spam_indicators=spam_indicators[:10],
             ham_indicators=ham_indicators[:10],
             analysis=analysis
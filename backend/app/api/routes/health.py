@@ -20,10 +20,12 @@ async def health_check(model_service: ModelService = Depends(get_model_service))
         model_service.index is not None and
         model_service.train_metadata is not None
     )
+    # Only report healthy once warmup has finished
+    ready = model_loaded and model_service.is_ready
 
     faiss_size = model_service.index.ntotal if model_service.index else None
     return HealthResponse(
-        status="healthy" if model_loaded else "unhealthy",
+        status="healthy" if ready else "unhealthy",
         version=settings.VERSION,
         model_loaded=model_loaded,
         faiss_index_size=faiss_size
@@ -3,8 +3,8 @@ Pydantic schemas for response/ request validation.
 """
 
 
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, List, Optional
 from enum import Enum
 
 
@@ -21,18 +21,19 @@ class SpamSubcategoryEnum(str, Enum):
     KHAC = "spam_khac"
 
 
+# Message text: stripped by the model config before the length check, so
+# whitespace-only messages are rejected
+MessageText = Annotated[str, Field(min_length=1, max_length=10000)]
+
+
 class ClassifyRequest(BaseModel):
     """Request model for classification."""
-    message: str = Field(..., min_length=1, max_length=10000, description="Message text to classify")
+    model_config = ConfigDict(str_strip_whitespace=True, validate_assignment=False)
+
+    message: MessageText = Field(..., description="Message text to classify")
     k: Optional[int] = Field(5, ge=1, le=20, description="Number of neighbors for KNN")
     alpha: Optional[float] = Field(0.8, ge=0.0, le=1.0, description="Saliency weight parameter")
     explain: bool = Field(False, description="Include detailed explainability")
-
-    @validator('message')
-    def validate_massage(cls, v):
-        if not v.strip():
-            raise ValueError('Message must not be empty or whitespace')
-        return v.strip()
     
     
 class NeighborInfo(BaseModel):
@@ -71,7 +72,9 @@ class ClassifyResponse(BaseModel):
     
 class BatchClassifyRequest(BaseModel):
     """Request model fro batch classification."""
-    messages: List[str] = Field(..., min_items=1, max_items=100)
+    model_config = ConfigDict(str_strip_whitespace=True, validate_assignment=False)
+
+    messages: List[MessageText] = Field(..., min_length=1, max_length=100)
     k: Optional[int] = Field(5, ge=1, le=20)
     alpha: Optional[float] = Field(None, ge=0.0, le=1.0)
     explain: bool = Field(False)
@@ -94,7 +97,9 @@ class HealthResponse(BaseModel):
     
 class ExplainRequest(BaseModel):
     """Request for detailed explainability."""
-    message: str = Field(..., min_length=1, max_length=10000)
+    model_config = ConfigDict(str_strip_whitespace=True, validate_assignment=False)
+
+    message: MessageText
     k: Optional[int] = Field(10, ge=1, le=50)
 
 
@@ -30,7 +30,8 @@ class Settings(BaseSettings):
     ARTIFACTS_PATH: str = str(PROJECT_ROOT / "artifacts")
     MODEL_NAME: str = "intfloat/multilingual-e5-base"
     FAISS_INDEX_PATH: str = str(Path(ARTIFACTS_PATH) / "faiss_index.bin")
-    METADATA_PATH: str = str(Path(ARTIFACTS_PATH) / "train_metadata.json")
+    METADATA_PATH: str = str(Path(ARTIFACTS_PATH) / "train_metadata.parquet")
+    METADATA_STORE_PATH: str = str(Path(ARTIFACTS_PATH) / "train_metadata.lmdb")
     CLASS_WEIGHTS_PATH: str = str(Path(ARTIFACTS_PATH) / "class_weights.json")
     CONFIG_PATH: str = str(Path(ARTIFACTS_PATH) / "model_config.json")
 
@@ -39,6 +40,26 @@ class Settings(BaseSettings):
     DEFAULT_ALPHA: float = 0.8
     MAX_SEQUENCE_LENGTH: int = 512
     BATCH_SIZE: int = 32
+    SALIENCY_METHOD: str = "gradient"  # "gradient" (input × grad) or "masking" (one pass per token)
+    EMBEDDING_BATCH_WAIT_MS: float = 10.0  # Max time to coalesce concurrent requests
+    CONFIDENCE_TEMPERATURE: float = 1.0  # Softmax temperature over [ham, spam] votes
+    
+    # Inference precision
+    USE_HALF_PRECISION: bool = True  # FP16 encoder weights on CUDA
+    QUANTIZE_CPU_MODEL: bool = True  # int8 dynamic quantization of Linear layers on CPU
+    TORCH_COMPILE: bool = False  # torch.compile the encoder, padding inputs to fixed length buckets
+    FAISS_FP16_INDEX: bool = True  # Store flat index vectors as FP16
+    FAISS_MMAP: bool = True  # Memory-map the index file instead of copying it into RAM
+    
+    # Caching
+    EMBEDDING_CACHE_SIZE: int = 10000  # Exact-match embeddings kept (0 disables)
+    RESULT_CACHE_SIZE: int = 1000  # Recent classification results kept (0 disables)
+    RESULT_CACHE_THRESHOLD: float = 0.98  # Min cosine similarity to reuse a cached result
+    
+    # FAISS search parameters for approximate indexes
+    FAISS_NPROBE: int = 16  # Inverted lists visited per query (IVF)
+    FAISS_EF_SEARCH: int = 64  # Candidate list size per query (HNSW)
+    FAISS_NUM_THREADS: int = 0  # OpenMP threads for FAISS search, 0 = all CPU cores
     
     # Data paths
     DATA_DIR: str = "data"
@@ -2,4 +2,5 @@
 Service module initialization.
 """
 
-from .model_loader import ModelService
\ No newline at end of file
+from .model_loader import ModelService
+from .embedding_batcher import EmbeddingBatcher
@@ -0,0 +1,95 @@
+"""
+In-process caches for embeddings and classification results
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+def text_key(text: str) -> bytes:
+    """Hash a text into a compact cache key"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None, marking it as recently used"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Insert a value, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+
+class SimilarityCache:
+    """Approximate cache returning stored values for near-duplicate query embeddings"""
+
+    def __init__(self, capacity: int, threshold: float):
+        self.capacity = capacity
+        self.threshold = threshold
+        # One inner-product index of recent queries per parameter key (e.g. (k, alpha))
+        self._entries: Dict[Hashable, Tuple[faiss.IndexFlatIP, List[Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, embeddings: np.ndarray) -> List[Optional[Any]]:
+        """Look up each [N, D] query row; None where no cached query is similar enough"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0].ntotal == 0:
+                return [None] * len(embeddings)
+            index, values = entry
+            scores, indices = index.search(embeddings, 1)
+
+        return [
+            values[idx] if idx >= 0 and score >= self.threshold else None
+            for score, idx in zip(scores[:, 0], indices[:, 0])
+        ]
+
+    def put(self, key: Hashable, embeddings: np.ndarray, values: List[Any]):
+        """Store values for the given [N, D] query rows"""
+        if self.capacity <= 0 or len(values) == 0:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            # Start a fresh generation once full rather than evicting row by row
+            if entry is None or entry[0].ntotal + len(values) > self.capacity:
+                entry = (faiss.IndexFlatIP(embeddings.shape[1]), [])
+                self._entries[key] = entry
+            index, stored = entry
+            index.add(embeddings)
+            stored.extend(values)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,92 @@
+"""
+Request coalescing for transformer embeddings
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core import settings
+from .model_loader import ModelService
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embedding requests into micro-batches for one forward pass"""
+
+    def __init__(
+        self,
+        model_service: ModelService,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self.model_service = model_service
+        self.max_batch_size = max_batch_size or settings.BATCH_SIZE
+        self.max_wait_ms = settings.EMBEDDING_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the background batching task"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Embedding batcher started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait_ms})"
+        )
+
+    async def stop(self):
+        """Stop the background batching task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Embedding batcher stopped")
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Queue a text and wait for its [1, D] embedding"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        """Drain the queue into batches of up to max_batch_size or max_wait_ms"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Embed a batch in a worker thread and resolve each request's future"""
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = await asyncio.to_thread(self.model_service.get_embeddings, texts)
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(texts)} texts: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for row, (_, future) in enumerate(batch):
+            # Skip requests that were cancelled while waiting
+            if not future.done():
+                future.set_result(embeddings[row:row + 1])
@@ -0,0 +1,126 @@
+"""
+Training metadata storage backends
+"""
+
+import logging
+from pathlib import Path
+from typing import Iterable, List
+
+import lmdb
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# LMDB layout written by scripts/train_model.py: two named databases keyed by the
+# FAISS id as an 8-byte big-endian integer, so cursor order equals id order.
+LMDB_LABELS_DB = b"labels"
+LMDB_MESSAGES_DB = b"messages"
+
+# Labels are int8 codes indexing LABEL_NAMES (the trainer's "label_names" in model_config.json)
+LABEL_NAMES = ("ham", "spam")
+# LMDB label values: one code byte, or the label name in artifacts from older trainers
+_LMDB_LABEL_CODES = {
+    **{bytes([code]): code for code in range(len(LABEL_NAMES))},
+    **{name.encode("utf-8"): code for code, name in enumerate(LABEL_NAMES)},
+}
+
+
+def encode_key(idx: int) -> bytes:
+    """Encode a FAISS id as an LMDB key"""
+    return int(idx).to_bytes(8, "big")
+
+
+def encode_labels(labels: Iterable) -> np.ndarray:
+    """Convert label codes or legacy label names to an int8 code array"""
+    labels = np.asarray(labels)
+    if labels.dtype.kind in "iu":
+        return labels.astype(np.int8)
+    codes = {name: code for code, name in enumerate(LABEL_NAMES)}
+    return np.fromiter((codes[label] for label in labels.tolist()), dtype=np.int8, count=len(labels))
+
+
+class MetadataStore:
+    """Training metadata (int8 label codes and messages) addressed by FAISS id"""
+
+    def __init__(self, labels: np.ndarray):
+        self.labels = encode_labels(labels)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def get_messages(self, indices: Iterable[int]) -> List[str]:
+        """Fetch the messages for the given ids"""
+        raise NotImplementedError
+
+
+class ArrowMetadataStore(MetadataStore):
+    """Metadata held as columns: a label array and an Arrow string array of messages"""
+
+    def __init__(self, labels: np.ndarray, messages: pa.Array):
+        super().__init__(labels)
+        # One contiguous buffer + offsets instead of a Python str per message
+        self._messages = messages
+
+    def get_messages(self, indices: Iterable[int]) -> List[str]:
+        """Fetch the messages for the given ids"""
+        return self._messages.take(pa.array(list(indices), type=pa.int64())).to_pylist()
+
+
+class ParquetMetadataStore(ArrowMetadataStore):
+    """Metadata from train_metadata.parquet"""
+
+    def __init__(self, path: str):
+        table = pq.read_table(path, columns=['label', 'message'])
+        super().__init__(
+            table.column('label').to_numpy(),
+            table.column('message').combine_chunks().cast(pa.large_string())
+        )
+
+
+class JsonMetadataStore(ArrowMetadataStore):
+    """Metadata from a legacy train_metadata.json"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            records = orjson.loads(f.read())
+        super().__init__(
+            np.array([record['label'] for record in records]),
+            pa.array([record['message'] for record in records], type=pa.large_string())
+        )
+
+
+class LmdbMetadataStore(MetadataStore):
+    """Metadata in a memory-mapped LMDB; messages are read on demand from the page cache"""
+
+    def __init__(self, path: str):
+        self._env = lmdb.open(
+            path, readonly=True, lock=False, readahead=False, max_dbs=2
+        )
+        labels_db = self._env.open_db(LMDB_LABELS_DB, create=False)
+        self._messages_db = self._env.open_db(LMDB_MESSAGES_DB, create=False)
+
+        with self._env.begin(db=labels_db) as txn:
+            labels = np.fromiter(
+                (_LMDB_LABEL_CODES[value] for _, value in txn.cursor()), dtype=np.int8
+            )
+        super().__init__(labels)
+
+    def get_messages(self, indices: Iterable[int]) -> List[str]:
+        """Fetch the messages for the given ids"""
+        with self._env.begin(db=self._messages_db) as txn:
+            return [txn.get(encode_key(idx)).decode('utf-8') for idx in indices]
+
+
+def load_metadata_store(lmdb_path: str, metadata_path: str) -> MetadataStore:
+    """Open the LMDB metadata store if present, otherwise load the Parquet (or legacy JSON) file"""
+    if lmdb_path and Path(lmdb_path).is_dir():
+        logger.info(f"Opening LMDB metadata store: {lmdb_path}")
+        return LmdbMetadataStore(lmdb_path)
+
+    logger.info(f"Loading training metadata from: {metadata_path}")
+    if Path(metadata_path).suffix == '.json':
+        return JsonMetadataStore(metadata_path)
+    return ParquetMetadataStore(metadata_path)
@@ -7,32 +7,131 @@ import torch.nn.functional as F
 from transformers import AutoTokenizer, AutoModel
 import faiss
 import numpy as np
-import json
+import ahocorasick
+import bisect
 import logging
+import orjson
+import os
+import re
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from app.core import settings
+from .cache import LRUCache, SimilarityCache, text_key
+from .metadata_store import LABEL_NAMES, load_metadata_store
 
 logger = logging.getLogger(__name__)
 
 
+SPAM_KEYWORDS = [
+    "free", "win", "winner", "cash", "prize", "click", "buy", "cheap",
+    "offer", "limited", "urgent", "act now", "subscribe", "risk-free",
+    "guarantee", "money back", "trial", "exclusive", "deal", "miễn phí",
+    "trúng", "thưởng", "tiền mặt", "nhấp", "mua", "rẻ", "khuyến mãi",
+    "giới hạn", "khẩn cấp", "đăng ký", "bảo đảm", "dùng thử", "độc quyền", "ưu đãi"
+]
+
+SOCIAL_KEYWORDS = [
+    'mom', 'boss', 'hr', 'manager', 'security update', 'unusual login',
+    'hospital bill', 'emergency', 'help buy', 'reimburse', 'gift cards',
+    'short-staffed', 'extra shifts', 'card was declined', 'warranty',
+    'mẹ', 'sếp', 'nhân sự', 'cập nhật bảo mật', 'đăng nhập bất thường',
+    'viện phí', 'khẩn cấp', 'giúp mua', 'hoàn tiền',
+    'thiếu nhân sự', 'ca làm thêm', 'thẻ bị từ chối', 'bảo hành'
+]
+
+URGENCY_KEYWORDS = [
+    'today', 'tomorrow', 'this week', 'before friday', 'reply yes',
+    'cancel anytime', 'confirm before', 'register early', 'already got mine',
+    'hôm nay', 'ngày mai', 'tuần này', 'trước thứ sáu', 'trả lời có'
+]
+
+# Currency words that mark an amount of money when they follow a number
+CURRENCY_WORDS = ['triệu', 'nghìn', 'đồng', 'dollar']
+
+# Subcategory keywords: advertising (quangcao) and system/social engineering (hethong)
+QUANGCAO_KEYWORDS = SPAM_KEYWORDS
+HETHONG_KEYWORDS = SOCIAL_KEYWORDS
+
+# Padded sequence lengths used when the encoder is compiled
+SEQUENCE_BUCKETS = (32, 64, 128, 256, 512)
+# Batch sizes run through the encoder at startup
+WARMUP_BATCH_SIZES = (1, 8, 32, 64)
+
+_MONEY_PATTERN = re.compile(r'\$\d+|\d+\$|\d+\s*(?:triệu|nghìn|đồng|dollar)')
+_DIGIT_PATTERN = re.compile(r'\d')
+_WORD_PATTERN = re.compile(r'\S+')
+_WHITESPACE_PATTERN = re.compile(r'\s')
+
+
+def _build_automaton(keyword_groups: Dict[str, List[str]]) -> ahocorasick.Automaton:
+    """Build an Aho-Corasick automaton mapping each keyword to the groups it belongs to"""
+    groups_by_keyword: Dict[str, Tuple[str, ...]] = {}
+    for group, keywords in keyword_groups.items():
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if group not in groups_by_keyword.get(keyword, ()):
+                groups_by_keyword[keyword] = groups_by_keyword.get(keyword, ()) + (group,)
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, groups in groups_by_keyword.items():
+        automaton.add_word(keyword, (keyword, groups))
+    automaton.make_automaton()
+    return automaton
+
+
 class ModelService:
     """Service for loading and managing ML models"""
     
     def __init__(self):
         self.model = None
+        # Callable used for embedding forward passes (self.model or its compiled wrapper)
+        self._encoder = None
         self.tokenizer = None
         self.index = None
         self.train_metadata = None
         self.class_weights = None
         self.config = None
+        # Dense label arrays indexed by FAISS id: 0 = ham, 1 = spam
+        self._label_codes = None
+        self._class_w = None
+        # Unit vector from the ham to the spam centroid, used for gradient saliency
+        self._spam_direction = None
+        self._quantized = False
+        # Set once load_model has run warmup passes through the encoder and index
+        self.is_ready = False
+        # Exact embedding cache by text hash, approximate result cache by query embedding
+        self._embedding_cache = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+        self._result_cache = SimilarityCache(
+            settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_THRESHOLD
+        )
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Using device: {self.device}")
+        # Pinned host buffers per tokenizer output, reused for every CUDA batch
+        self._staging: Dict[str, torch.Tensor] = {}
+        self._staging_event = None
+        self._staging_lock = threading.Lock()
+        
+        # Keyword automata for single-pass multi-pattern matching
+        self._saliency_automaton = _build_automaton({
+            "spam": SPAM_KEYWORDS,
+            "social": SOCIAL_KEYWORDS,
+            "urgency": URGENCY_KEYWORDS,
+            "currency": CURRENCY_WORDS,
+        })
+        self._subcategory_automaton = _build_automaton({
+            "quangcao": QUANGCAO_KEYWORDS,
+            "hethong": HETHONG_KEYWORDS,
+        })
 
     def load_model(self):
         """Load all required models and artifacts"""
         try:
+            self.is_ready = False
+            # Cached embeddings and results are only valid for the previous model
+            self.clear_caches()
+            
             # Load transformers model
             logger.info(f"Loading transformer model: {settings.MODEL_NAME}")
             self.tokenizer = AutoTokenizer.from_pretrained(settings.MODEL_NAME)
@@ -40,33 +139,152 @@ class ModelService:
             self.model = self.model.to(self.device)
             self.model.eval()   
             
+            if self.device.type == "cuda" and settings.USE_HALF_PRECISION:
+                logger.info("Casting transformer model to FP16")
+                self.model = self.model.half()
+            elif self.device.type == "cpu" and settings.QUANTIZE_CPU_MODEL:
+                logger.info("Applying int8 dynamic quantization to transformer model")
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                self._quantized = True
+            # Saliency gradients are only needed w.r.t. the inputs
+            self.model.requires_grad_(False)
+            
+            self._encoder = self.model
+            if settings.TORCH_COMPILE:
+                logger.info("Compiling transformer model with torch.compile")
+                self._encoder = torch.compile(self.model, mode="reduce-overhead", fullgraph=False)
+            
+            if self.device.type == "cuda":
+                self._allocate_staging_buffers()
+            
             # Load FAISS index
             logger.info(f"Loading FAISS index from: {settings.FAISS_INDEX_PATH}")
             if not Path(settings.FAISS_INDEX_PATH).exists():
                 raise FileNotFoundError(f"FAISS index file not found at {settings.FAISS_INDEX_PATH}")
-            self.index = faiss.read_index(settings.FAISS_INDEX_PATH)
+            self.index = self._read_index(settings.FAISS_INDEX_PATH)
+            if settings.FAISS_FP16_INDEX:
+                self.index = self._to_fp16_index(self.index)
+            self._configure_index_search(self.index)
             
             # Load metadata
-            logger.info(f"Loading training metadata from: {settings.METADATA_PATH}")
-            with open(settings.METADATA_PATH, 'r', encoding='utf-8') as f:
-                self.train_metadata = json.load(f)
+            self.train_metadata = load_metadata_store(
+                settings.METADATA_STORE_PATH, settings.METADATA_PATH
+            )
                 
             # Load class weights
             logger.info(f"Loading class weights from: {settings.CLASS_WEIGHTS_PATH}")
-            with open(settings.CLASS_WEIGHTS_PATH, 'r', encoding='utf-8') as f:
-                self.class_weights = json.load(f)
+            with open(settings.CLASS_WEIGHTS_PATH, 'rb') as f:
+                self.class_weights = orjson.loads(f.read())
             
             # Load config
             logger.info(f"Loading model config from: {settings.CONFIG_PATH}")
-            with open(settings.CONFIG_PATH, 'r', encoding='utf-8') as f:
-                self.config = json.load(f)
-                
+            with open(settings.CONFIG_PATH, 'rb') as f:
+                self.config = orjson.loads(f.read())
+            
+            self._build_label_arrays()
+            if settings.SALIENCY_METHOD == "gradient":
+                self._spam_direction = self._compute_spam_direction()
+            
+            self.warmup()
+            self.is_ready = True
             logger.info("All models and artifacts loaded successfully.")
             
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
 
+    def warmup(self):
+        """Run forward passes and a search so the first request doesn't pay kernel/JIT setup"""
+        logger.info(f"Warming up encoder at batch sizes {WARMUP_BATCH_SIZES}")
+        for batch_size in WARMUP_BATCH_SIZES:
+            self.get_embeddings(["warmup"] * batch_size, use_cache=False)
+        self.index.search(np.zeros((1, self.index.d), dtype='float32'), settings.DEFAULT_K)
+        
+    def clear_caches(self):
+        """Invalidate cached embeddings and classification results"""
+        self._embedding_cache.clear()
+        self._result_cache.clear()
+
+    def _build_label_arrays(self):
+        """Precompute label codes and class weights as arrays for vectorized voting"""
+        self._label_codes = self.train_metadata.labels
+        self._class_w = np.array(
+            [self.class_weights['ham'], self.class_weights['spam']], dtype=np.float32
+        )
+
+    def _compute_spam_direction(self) -> Optional[torch.Tensor]:
+        """Compute the normalized spam-minus-ham centroid from vectors stored in the index"""
+        if self._quantized:
+            logger.info("Gradient saliency is unavailable for the quantized model, using token masking")
+            return None
+        
+        try:
+            ivf_index = faiss.try_extract_index_ivf(self.index)
+            if ivf_index is not None:
+                ivf_index.make_direct_map()
+            
+            sums = np.zeros((2, self.index.d), dtype=np.float64)
+            chunk_size = 10000
+            for start in range(0, self.index.ntotal, chunk_size):
+                n = min(chunk_size, self.index.ntotal - start)
+                vectors = self.index.reconstruct_n(start, n)
+                codes = self._label_codes[start:start + n]
+                sums[0] += vectors[codes == 0].sum(axis=0)
+                sums[1] += vectors[codes == 1].sum(axis=0)
+        except RuntimeError as e:
+            logger.warning(f"Cannot reconstruct index vectors for gradient saliency, using token masking: {e}")
+            return None
+        
+        counts = np.bincount(self._label_codes, minlength=2)
+        centroids = sums / np.maximum(counts, 1)[:, None]
+        direction = torch.from_numpy(centroids[1] - centroids[0]).float().to(self.device)
+        logger.info("Computed class centroids for gradient saliency")
+        return F.normalize(direction, p=2, dim=0)
+
+    def _read_index(self, path: str) -> faiss.Index:
+        """Read a FAISS index, memory-mapping its inverted lists when supported"""
+        if settings.FAISS_MMAP:
+            try:
+                return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logger.warning(f"Memory-mapped FAISS read not supported for this index, loading into RAM: {e}")
+        return faiss.read_index(path)
+
+    def _to_fp16_index(self, index: faiss.Index) -> faiss.Index:
+        """Re-encode a flat FAISS index with FP16 scalar quantization"""
+        if not isinstance(index, faiss.IndexFlat):
+            return index
+        
+        logger.info("Converting flat FAISS index to FP16 scalar quantizer")
+        vectors = index.reconstruct_n(0, index.ntotal)
+        fp16_index = faiss.IndexScalarQuantizer(
+            index.d, faiss.ScalarQuantizer.QT_fp16, index.metric_type
+        )
+        fp16_index.train(vectors)
+        fp16_index.add(vectors)
+        return fp16_index
+
+    def _configure_index_search(self, index: faiss.Index):
+        """Apply query-time parameters to approximate (IVF / HNSW) FAISS indexes"""
+        num_threads = settings.FAISS_NUM_THREADS or os.cpu_count() or 1
+        faiss.omp_set_num_threads(num_threads)
+        logger.info(f"Set FAISS OpenMP threads={num_threads}")
+        
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            ivf_index.nprobe = settings.FAISS_NPROBE
+            # Parallelize over the probed lists within a query, not only across queries
+            ivf_index.parallel_mode = 1
+            logger.info(f"Set FAISS nprobe={settings.FAISS_NPROBE} ({ivf_index.nlist} lists)")
+        
+        if isinstance(index, faiss.IndexPreTransform):
+            index = faiss.downcast_index(index.index)
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = settings.FAISS_EF_SEARCH
+            logger.info(f"Set FAISS efSearch={settings.FAISS_EF_SEARCH}")
+
     def average_pool(self, last_hidden_states, attention_mask):
         """Average pooling for embeddings"""
         last_hidden = last_hidden_states.masked_fill(
@@ -76,57 +294,135 @@ class ModelService:
     
     def get_embedding(self, text: str) -> np.ndarray:
         """Get embedding for a single text input"""
-        query_text = f"query: {text}"
-        batch_dict = self.tokenizer(
-            [query_text],
-            max_length=settings.MAX_SEQUENCE_LENGTH,
-            padding=True,
-            truncation=True,
-            return_tensors="pt"
-        )
-        batch_dict = {k: v.to(self.device) for k, v in batch_dict.items()}
+        return self.get_embeddings([text])
+    
+    def get_embeddings(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        """Get embeddings for a list of text inputs, embedding cache misses in batched forward passes"""
+        if not use_cache:
+            return self._compute_embeddings(texts)
         
-        with torch.no_grad():
-            output = self.model(**batch_dict)
-            embedding = self.average_pool(output.last_hidden_state, batch_dict['attention_mask'])
-            embedding = F.normalize(embedding, p=2, dim=1)
-            return embedding.cpu().numpy().astype('float32')
+        keys = [text_key(text) for text in texts]
+        cached = [self._embedding_cache.get(key) for key in keys]
+        misses = [i for i, embedding in enumerate(cached) if embedding is None]
+        
+        if misses:
+            computed = self._compute_embeddings([texts[i] for i in misses])
+            for i, embedding in zip(misses, computed):
+                cached[i] = embedding
+                self._embedding_cache.put(keys[i], embedding)
+        
+        return np.stack(cached)
+    
+    def _compute_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Run the encoder over texts in BATCH_SIZE chunks"""
+        query_texts = [f"query: {text}" for text in texts]
+        embeddings = []
+        
+        for i in range(0, len(query_texts), settings.BATCH_SIZE):
+            batch_dict = self.tokenizer(
+                query_texts[i:i + settings.BATCH_SIZE],
+                max_length=settings.MAX_SEQUENCE_LENGTH,
+                padding=True,
+                truncation=True,
+                return_tensors="pt"
+            )
+            if settings.TORCH_COMPILE:
+                batch_dict = self._pad_to_bucket(batch_dict)
+            batch_dict = self._to_device(batch_dict)
+            
+            with torch.inference_mode():
+                output = self._encoder(**batch_dict)
+                batch_embeddings = self.average_pool(output.last_hidden_state, batch_dict['attention_mask'])
+                # Keep FAISS queries in FP32 regardless of model precision
+                batch_embeddings = batch_embeddings.float()
+                batch_embeddings = F.normalize(batch_embeddings, p=2, dim=1)
+                embeddings.append(batch_embeddings.cpu().numpy())
+        
+        return np.vstack(embeddings).astype('float32')
+        
+    def _allocate_staging_buffers(self):
+        """Allocate pinned (BATCH_SIZE, MAX_SEQUENCE_LENGTH) int64 buffers for the tokenizer outputs"""
+        numel = settings.BATCH_SIZE * settings.MAX_SEQUENCE_LENGTH
+        self._staging = {
+            name: torch.empty(numel, dtype=torch.int64, pin_memory=True)
+            for name in self.tokenizer.model_input_names
+        }
+        self._staging_event = None
+        
+    def _to_device(self, batch_dict: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Move a tokenized batch to the device, via pinned staging buffers and async copies on CUDA"""
+        if self.device.type != "cuda":
+            return {k: v.to(self.device) for k, v in batch_dict.items()}
+        
+        with self._staging_lock:
+            # The previous batch's copies must have left the buffers before they are overwritten
+            if self._staging_event is not None:
+                self._staging_event.synchronize()
+            
+            device_batch = {}
+            for k, v in batch_dict.items():
+                staging = self._staging.get(k)
+                if staging is None or staging.numel() < v.numel() or staging.dtype != v.dtype:
+                    staging = torch.empty(v.numel(), dtype=v.dtype, pin_memory=True)
+                    self._staging[k] = staging
+                host = staging[:v.numel()].view(v.shape)
+                host.copy_(v)
+                device_batch[k] = host.to(self.device, non_blocking=True)
+            
+            self._staging_event = torch.cuda.Event()
+            self._staging_event.record()
+        
+        return device_batch
+        
+    def _pad_to_bucket(self, batch_dict: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Right-pad a tokenized batch to the next fixed sequence length to avoid recompiles"""
+        seq_len = batch_dict['input_ids'].shape[1]
+        bucket = next((b for b in SEQUENCE_BUCKETS if b >= seq_len), seq_len)
+        bucket = min(bucket, max(seq_len, settings.MAX_SEQUENCE_LENGTH))
+        if bucket == seq_len:
+            return batch_dict
+        
+        pad_values = {'input_ids': self.tokenizer.pad_token_id}
+        return {
+            k: F.pad(v, (0, bucket - seq_len), value=pad_values.get(k, 0))
+            for k, v in batch_dict.items()
+        }
+        
+    def _match_keywords(self, automaton: ahocorasick.Automaton, text_lower: str) -> List[Tuple[int, str, Tuple[str, ...]]]:
+        """Find all keyword occurrences in one pass as (start, keyword, groups)"""
+        return [
+            (end_idx - len(keyword) + 1, keyword, groups)
+            for end_idx, (keyword, groups) in automaton.iter(text_lower)
+        ]
         
     def compute_quick_saliency(self, text: str) -> float:
         """Compute quick saliency weight"""
         words = text.lower().split()
         text_lower = text.lower()
         
-        spam_keywords = [
-            "free", "win", "winner", "cash", "prize", "click", "buy", "cheap",
-            "offer", "limited", "urgent", "act now", "subscribe", "risk-free",
-            "guarantee", "money back", "trial", "exclusive", "deal", "miễn phí",
-            "trúng", "thưởng", "tiền mặt", "nhấp", "mua", "rẻ", "khuyến mãi",
-            "giới hạn", "khẩn cấp", "đăng ký", "bảo đảm", "dùng thử", "độc quyền", "ưu đãi"
-        ]
-        
-        social_keywords = [
-        'mom', 'boss', 'hr', 'manager', 'security update', 'unusual login',
-        'hospital bill', 'emergency', 'help buy', 'reimburse', 'gift cards',
-        'short-staffed', 'extra shifts', 'card was declined', 'warranty',
-        'mẹ', 'sếp', 'nhân sự', 'cập nhật bảo mật', 'đăng nhập bất thường',
-        'viện phí', 'khẩn cấp', 'giúp mua', 'hoàn tiền',
-        'thiếu nhân sự', 'ca làm thêm', 'thẻ bị từ chối', 'bảo hành'
-        ]
+        word_starts = [m.start() for m in _WORD_PATTERN.finditer(text_lower)]
+        spam_words = set()
+        matched = {"social": set(), "urgency": set()}
+        has_currency = False
         
-        urgency_keywords = [
-        'today', 'tomorrow', 'this week', 'before friday', 'reply yes',
-        'cancel anytime', 'confirm before', 'register early', 'already got mine',
-        'hôm nay', 'ngày mai', 'tuần này', 'trước thứ sáu', 'trả lời có'
-        ]
+        for start_idx, keyword, groups in self._match_keywords(self._saliency_automaton, text_lower):
+            # Spam keywords count once per word that contains them
+            if "spam" in groups and not _WHITESPACE_PATTERN.search(keyword):
+                spam_words.add(bisect.bisect_right(word_starts, start_idx) - 1)
+            has_currency = has_currency or "currency" in groups
+            # Social and urgency keywords count once per distinct keyword
+            for group in groups:
+                if group in matched:
+                    matched[group].add(keyword)
         
-        spam_score = sum(1 for word in words if any(k in word for k in spam_keywords))
-        social_score = sum(2 for k in social_keywords if k in text_lower)
-        urgency_score = sum(1.5 for k in urgency_keywords if k in text_lower)
+        spam_score = len(spam_words)
+        social_score = 2 * len(matched["social"])
+        urgency_score = 1.5 * len(matched["urgency"])
         
-        import re
-        money_pattern = r'\$\d+|\d+\$|\d+\s*(triệu|nghìn|đồng|dollar)'
-        money_score = 2 if re.search(money_pattern, text_lower) else 0
+        # Only run the money regex when the scan found a currency marker next to some digit
+        money_score = 0
+        if (has_currency or '$' in text_lower) and _DIGIT_PATTERN.search(text_lower):
+            money_score = 2 if _MONEY_PATTERN.search(text_lower) else 0
         
         total_score = (spam_score + social_score + urgency_score + money_score)
         saliency = min(1.0, max(0.1, total_score / max(len(words), 1) + 0.2))
@@ -137,46 +433,98 @@ class ModelService:
         self,
         text: str,
         k: int = 5,
-        alpha: Optional[float] = None
+        alpha: Optional[float] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> Dict:
-        """Classify text using weighted KNN"""
+        """Classify text using weighted KNN, optionally with a precomputed [1, D] embedding"""
+        return self.classify_weighted_knn_batch(
+            [text], k=k, alpha=alpha, query_embeddings=query_embedding
+        )[0]
+    
+    def classify_weighted_knn_batch(
+        self,
+        texts: List[str],
+        k: int = 5,
+        alpha: Optional[float] = None,
+        query_embeddings: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """Classify a list of texts using weighted KNN with one embedding pass and one search"""
         if alpha is None:
             alpha = self.config.get('best_alpha', settings.DEFAULT_ALPHA)
             
-        # Get embedding
-        query_embedding = self.get_embedding(text)
+        # Get embeddings
+        if query_embeddings is None:
+            query_embeddings = self.get_embeddings(texts)
+        
+        # Reuse results of near-identical recent queries with the same parameters
+        cache_key = (k, alpha)
+        results = self._result_cache.get(cache_key, query_embeddings)
+        misses = [row for row, result in enumerate(results) if result is None]
+        if not misses:
+            return results
         
         # Search neighbors
-        scores, indices = self.index.search(query_embedding, k)
+        miss_embeddings = query_embeddings[misses]
+        scores, indices = self.index.search(miss_embeddings, k)
+        
+        computed = [
+            self._weighted_vote(texts[row], scores[i], indices[i], alpha)
+            for i, row in enumerate(misses)
+        ]
+        self._result_cache.put(cache_key, miss_embeddings, computed)
         
+        for row, result in zip(misses, computed):
+            results[row] = result
+        return results
+    
+    def _weighted_vote(
+        self,
+        text: str,
+        scores: np.ndarray,
+        indices: np.ndarray,
+        alpha: float
+    ) -> Dict:
+        """Aggregate weighted KNN votes for one query's search results"""
         # Compute saliency
         saliency_weight = self.compute_quick_saliency(text)
         
-        # Calculate weighted votes
-        vote_scores = {"ham": 0.0, "spam": 0.0}
-        neighbors = []
-
-        for i in range(k):
-            neighbor_idx = indices[0][i]
-            similarity = float(scores[0][i])
-            neighbor_label = self.train_metadata[neighbor_idx]['label']
-            neighbor_message = self.train_metadata[neighbor_idx]['message']
-            
-            # Weighted formula: (1-α)×similarity×class_weight + α×saliency_weight
-            weight = (1 - alpha) * similarity * self.class_weights[neighbor_label] + alpha * saliency_weight
-            
-            vote_scores[neighbor_label] += weight
-            
-            neighbors.append({
-                "label": neighbor_label,
-                "similarity": similarity,
+        # Approximate indexes return -1 when fewer than k neighbors are found
+        valid = indices >= 0
+        neighbor_ids = indices[valid]
+        similarities = scores[valid]
+        
+        # Weighted formula: (1-α)×similarity×class_weight + α×saliency_weight
+        codes = self._label_codes[neighbor_ids]
+        weights = (1 - alpha) * similarities * self._class_w[codes] + alpha * saliency_weight
+        
+        # Calculate weighted votes as [ham, spam]
+        votes = np.array(
+            [weights[codes == 0].sum(), weights[codes == 1].sum()], dtype=np.float32
+        )
+        vote_scores = {"ham": float(votes[0]), "spam": float(votes[1])}
+        
+        # Only materialize the k returned neighbors
+        messages = self.train_metadata.get_messages(neighbor_ids.tolist())
+        neighbors = [
+            {
+                "label": LABEL_NAMES[code],
+                # Quantized scores can drift slightly outside [0, 1]
+                "similarity": min(max(similarity, 0.0), 1.0),
                 "weight": weight,
-                "message": neighbor_message[:100] + "..." if len(neighbor_message) > 100 else neighbor_message
-            })
+                "message": message[:100] + "..." if len(message) > 100 else message
+            }
+            for code, similarity, weight, message in zip(
+                codes.tolist(), similarities.tolist(), weights.tolist(), messages
+            )
+        ]
 
-        # Get final prediction
-        predicted_label = max(vote_scores, key=vote_scores.get)
-        confidence = vote_scores[predicted_label] / sum(vote_scores.values())
+        # Get final prediction; a max-shifted softmax stays finite even when both votes are 0
+        logits = votes / settings.CONFIDENCE_TEMPERATURE
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        predicted_idx = int(probs.argmax())
+        predicted_label = LABEL_NAMES[predicted_idx]
+        confidence = float(probs[predicted_idx])
 
         return {
             "prediction": predicted_label,
@@ -191,25 +539,13 @@ class ModelService:
         """Classify spam subcategory"""
         text_lower = text.lower()
         
-        quangcao_keywords = [
-            "free", "win", "winner", "cash", "prize", "click", "buy", "cheap",
-            "offer", "limited", "urgent", "act now", "subscribe", "risk-free",
-            "guarantee", "money back", "trial", "exclusive", "deal", "miễn phí",
-            "trúng", "thưởng", "tiền mặt", "nhấp", "mua", "rẻ", "khuyến mãi",
-            "giới hạn", "khẩn cấp", "đăng ký", "bảo đảm", "dùng thử", "độc quyền", "ưu đãi"
-        ]
+        matched = {"quangcao": set(), "hethong": set()}
+        for _, keyword, groups in self._match_keywords(self._subcategory_automaton, text_lower):
+            for group in groups:
+                matched[group].add(keyword)
         
-        hethong_keywords = [
-            'mom', 'boss', 'hr', 'manager', 'security update', 'unusual login',
-            'hospital bill', 'emergency', 'help buy', 'reimburse', 'gift cards',
-            'short-staffed', 'extra shifts', 'card was declined', 'warranty',
-            'mẹ', 'sếp', 'nhân sự', 'cập nhật bảo mật', 'đăng nhập bất thường',
-            'viện phí', 'khẩn cấp', 'giúp mua', 'hoàn tiền',
-            'thiếu nhân sự', 'ca làm thêm', 'thẻ bị từ chối', 'bảo hành'
-        ]
-        
-        quangcao_score = sum(1 for k in quangcao_keywords if k in text_lower)
-        hethong_score = sum(1 for k in hethong_keywords if k in text_lower)
+        quangcao_score = len(matched["quangcao"])
+        hethong_score = len(matched["hethong"])
         
         if max(quangcao_score, hethong_score) == 0:
             return "spam_khac"
@@ -220,40 +556,79 @@ class ModelService:
         
     def compute_token_saliency(self, text: str, k: int = 10) -> List[Dict]:
         """Compute token-level saliency for explainability"""
-        tokens = self.tokenizer.tokenize(text)
+        if self._spam_direction is not None:
+            return self.compute_token_saliency_grad(text)
+        return self.compute_token_saliency_masked(text, k)
+    
+    def compute_token_saliency_grad(self, text: str) -> List[Dict]:
+        """Compute token-level saliency as |input × gradient| of the embedding's spam-direction score"""
+        prefix = "query: "
+        batch_dict = self.tokenizer(
+            f"{prefix}{text}",
+            max_length=settings.MAX_SEQUENCE_LENGTH,
+            truncation=True,
+            return_offsets_mapping=True,
+            return_special_tokens_mask=True,
+            return_tensors="pt"
+        )
+        offsets = batch_dict.pop("offset_mapping")[0].tolist()
+        special_tokens = batch_dict.pop("special_tokens_mask")[0].tolist()
+        batch_dict = {k: v.to(self.device) for k, v in batch_dict.items()}
+        input_ids = batch_dict.pop("input_ids")
+        
+        # Keep only tokens of the message itself (drop the prefix and special tokens)
+        positions = [
+            i for i, ((start, _), special) in enumerate(zip(offsets, special_tokens))
+            if not special and start >= len(prefix)
+        ]
+        tokens = self.tokenizer.convert_ids_to_tokens(input_ids[0, positions].tolist())
         
         if len(tokens) <= 1:
             return [{"token": text, "saliency": 1.0}]
         
-        # Get original prediction
-        original_embedding = self.get_embedding(text)
-        original_scores, original_indices = self.index.search(original_embedding, k)
-        original_spam_score = sum(
-            s for s, idx in zip(original_scores[0], original_indices[0])
-            if self.train_metadata[idx]['label'] == 'spam'  
-        )
+        with torch.enable_grad():
+            inputs_embeds = self.model.get_input_embeddings()(input_ids).detach().requires_grad_(True)
+            output = self.model(inputs_embeds=inputs_embeds, **batch_dict)
+            embedding = self.average_pool(output.last_hidden_state, batch_dict['attention_mask']).float()
+            embedding = F.normalize(embedding, p=2, dim=1)
+            spam_score = (embedding[0] * self._spam_direction).sum()
+            spam_score.backward()
         
-        saliencies = []
-
-        # Mask each token and compute change
-        for i, token in enumerate(tokens):
+        saliency = (inputs_embeds.grad * inputs_embeds.detach()).sum(dim=-1).abs()[0, positions]
+        arr = saliency.float().cpu().numpy()
+        
+        # Normalize saliencies to [0, 1]
+        arr = (arr - arr.min()) / (np.ptp(arr) + 1e-12)
+        
+        return [
+            {"token": token, "saliency": float(value)}
+            for token, value in zip(tokens, arr)
+        ]
+    
+    def compute_token_saliency_masked(self, text: str, k: int = 10) -> List[Dict]:
+        """Compute token-level saliency as the spam-score change when masking each token"""
+        tokens = self.tokenizer.tokenize(text)
+        
+        if len(tokens) <= 1:
+            return [{"token": text, "saliency": 1.0}]
+        
+        # Build the original text followed by one variant per masked token
+        variants = [text]
+        for i in range(len(tokens)):
             token_mask = tokens.copy()
             token_mask[i] = self.tokenizer.pad_token
-            masked_text = self.tokenizer.convert_tokens_to_string(token_mask)
-            
-            masked_embedding = self.get_embedding(masked_text)
-            masked_scores, masked_indices = self.index.search(masked_embedding, k)
-            masked_spam_score = sum(
-                s for s, idx in zip(masked_scores[0], masked_indices[0])
-                if self.train_metadata[idx]['label'] == 'spam'
-            )
-
-            # Compute saliency as the change in spam score
-            saliency = original_spam_score - masked_spam_score
-            saliencies.append(saliency)
+            variants.append(self.tokenizer.convert_tokens_to_string(token_mask))
+        
+        # Embed and search all variants at once: [N+1, D]
+        embeddings = self.get_embeddings(variants, use_cache=False)
+        scores, indices = self.index.search(embeddings, k)
+        is_spam = (indices >= 0) & (self._label_codes[indices] == 1)
+        spam_scores = np.where(is_spam, scores, 0.0).sum(axis=1)
+        
+        # Compute saliency as the change in spam score
+        arr = spam_scores[0] - spam_scores[1:]
             
         # Normalize saliencies to [0, 1]
-        arr = np.array(saliencies)
         if len(arr) > 1:
             arr = (arr - arr.min()) / (np.ptp(arr) + 1e-12)
         else:
@@ -10,7 +10,7 @@ import logging
 
 from app.core import settings
 from app.api import classifier, health, explain
-from app.services import ModelService
+from app.services import ModelService, EmbeddingBatcher
 
 
 # Configure logging
@@ -39,10 +39,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to load model or FAISS index: {e}")
         raise 
+    
+    # Start request coalescing for embeddings
+    embedding_batcher = EmbeddingBatcher(model_service)
+    await embedding_batcher.start()
+    app.state.embedding_batcher = embedding_batcher
     yield
     
     logger.info("Shutting down application ...")
-    # Clean up resources if needed
+    await embedding_batcher.stop()
 
 
 # Initialize FastAPI app
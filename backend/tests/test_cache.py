@@ -0,0 +1,50 @@
+"""
+Cache unit tests
+"""
+
+import numpy as np
+from app.services.cache import LRUCache, SimilarityCache, text_key
+
+
+class TestLRUCache:
+    """Test LRUCache class"""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted first"""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_text_key_is_stable(self):
+        """Test identical texts share a key"""
+        assert text_key("Win $1000 now!") == text_key("Win $1000 now!")
+        assert text_key("Win $1000 now!") != text_key("Win $1000 now")
+
+
+class TestSimilarityCache:
+    """Test SimilarityCache class"""
+
+    def test_returns_value_for_near_duplicate(self):
+        """Test lookups hit only above the similarity threshold and for the same key"""
+        cache = SimilarityCache(capacity=10, threshold=0.98)
+        stored = np.array([[1.0, 0.0]], dtype="float32")
+        cache.put((5, 0.8), stored, ["spam-result"])
+
+        queries = np.array([[0.999, 0.0447], [0.0, 1.0]], dtype="float32")
+        assert cache.get((5, 0.8), queries) == ["spam-result", None]
+        assert cache.get((10, 0.8), queries) == [None, None]
+
+    def test_resets_when_full(self):
+        """Test a new generation starts once capacity is exceeded"""
+        cache = SimilarityCache(capacity=1, threshold=0.98)
+        first = np.array([[1.0, 0.0]], dtype="float32")
+        second = np.array([[0.0, 1.0]], dtype="float32")
+        cache.put("key", first, ["first"])
+        cache.put("key", second, ["second"])
+        assert cache.get("key", first) == [None]
+        assert cache.get("key", second) == ["second"]
@@ -0,0 +1,54 @@
+"""
+Embedding batcher tests
+"""
+
+import asyncio
+import numpy as np
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class FakeModelService:
+    """Model service returning one embedding row per text"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_embeddings(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(len(t))] for t in texts], dtype="float32")
+
+
+class TestEmbeddingBatcher:
+    """Test EmbeddingBatcher class"""
+
+    def test_concurrent_requests_share_one_batch(self):
+        """Test concurrent requests are coalesced into one forward pass"""
+        service = FakeModelService()
+
+        async def run():
+            batcher = EmbeddingBatcher(service, max_batch_size=8, max_wait_ms=50)
+            await batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.embed("x" * n) for n in range(1, 5)))
+            finally:
+                await batcher.stop()
+
+        embeddings = asyncio.run(run())
+        assert len(service.calls) == 1
+        assert [e.shape for e in embeddings] == [(1, 1)] * 4
+        assert [float(e[0, 0]) for e in embeddings] == [1.0, 2.0, 3.0, 4.0]
+
+    def test_batch_size_limit(self):
+        """Test batches are split at max_batch_size"""
+        service = FakeModelService()
+
+        async def run():
+            batcher = EmbeddingBatcher(service, max_batch_size=2, max_wait_ms=50)
+            await batcher.start()
+            try:
+                await asyncio.gather(*(batcher.embed("msg") for _ in range(5)))
+            finally:
+                await batcher.stop()
+
+        asyncio.run(run())
+        assert [len(call) for call in service.calls] == [2, 2, 1]
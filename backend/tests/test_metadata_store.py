@@ -0,0 +1,66 @@
+"""
+Metadata store tests
+"""
+
+import json
+import lmdb
+import pandas as pd
+from app.services.metadata_store import (
+    LABEL_NAMES, LMDB_LABELS_DB, LMDB_MESSAGES_DB, encode_key, load_metadata_store
+)
+
+
+RECORDS = [
+    {"index": 0, "message": "Hello friend", "label": "ham"},
+    {"index": 1, "message": "Win $1000 now!", "label": "spam"},
+    {"index": 2, "message": "Chào bạn, hẹn gặp lại nhé!", "label": "ham"},
+]
+
+
+def write_lmdb(path, records):
+    """Write records using the trainer's LMDB layout"""
+    env = lmdb.open(str(path), map_size=1 << 20, max_dbs=2)
+    labels_db = env.open_db(LMDB_LABELS_DB)
+    messages_db = env.open_db(LMDB_MESSAGES_DB)
+    with env.begin(write=True) as txn:
+        for i, record in enumerate(records):
+            code = LABEL_NAMES.index(record["label"])
+            txn.put(encode_key(i), bytes([code]), db=labels_db)
+            txn.put(encode_key(i), record["message"].encode("utf-8"), db=messages_db)
+    env.close()
+
+
+class TestMetadataStore:
+    """Test metadata store backends"""
+
+    def test_json_store(self, tmp_path):
+        """Test loading legacy metadata with label names from JSON"""
+        json_path = tmp_path / "train_metadata.json"
+        json_path.write_text(json.dumps(RECORDS), encoding="utf-8")
+
+        store = load_metadata_store(str(tmp_path / "missing.lmdb"), str(json_path))
+        assert len(store) == 3
+        assert store.labels.tolist() == [0, 1, 0]
+        assert store.get_messages([2, 1]) == [RECORDS[2]["message"], RECORDS[1]["message"]]
+
+    def test_parquet_store(self, tmp_path):
+        """Test loading metadata from Parquet"""
+        parquet_path = tmp_path / "train_metadata.parquet"
+        df = pd.DataFrame(RECORDS)
+        df["label"] = df["label"].map(LABEL_NAMES.index).astype("int8")
+        df.to_parquet(parquet_path, compression="zstd", index=False)
+
+        store = load_metadata_store(str(tmp_path / "missing.lmdb"), str(parquet_path))
+        assert len(store) == 3
+        assert store.labels.tolist() == [0, 1, 0]
+        assert store.get_messages([1, 2]) == [RECORDS[1]["message"], RECORDS[2]["message"]]
+
+    def test_lmdb_store(self, tmp_path):
+        """Test reading metadata on demand from LMDB"""
+        lmdb_path = tmp_path / "train_metadata.lmdb"
+        write_lmdb(lmdb_path, RECORDS)
+
+        store = load_metadata_store(str(lmdb_path), str(tmp_path / "missing.json"))
+        assert len(store) == 3
+        assert store.labels.tolist() == [0, 1, 0]
+        assert store.get_messages([2, 0]) == [RECORDS[2]["message"], RECORDS[0]["message"]]
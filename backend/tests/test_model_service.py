@@ -39,4 +39,11 @@ class TestModelService:
         # Security spam
         security_text = "Your account will be suspended. Verify now!"
         subcategory = model_service.classify_spam_subcategory(security_text)
-        assert subcategory == "spam_hethong"
\ No newline at end of file
+        assert subcategory == "spam_hethong"
+    
+    def test_subcategory_matches_multiword_keywords(self, model_service):
+        """Test multi-word keywords are matched in a single scan"""
+        vi_security_text = "Cập nhật bảo mật tài khoản, đăng nhập bất thường"
+        subcategory = model_service.classify_spam_subcategory(vi_security_text)
+        assert subcategory == "spam_hethong"
+
@@ -3,17 +3,103 @@ Data loading and preprocessing script
 Loads data from Google Drive and Kaggle, combines and preprocesses
 """
 
+import hashlib
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import gdown
 import kagglehub
 from kagglehub import KaggleDatasetAdapter
 import logging
 from pathlib import Path
-from typing import Tuple, List
+from typing import Callable, FrozenSet, Iterable, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Arrow-backed strings keep text in contiguous buffers instead of Python objects
+TEXT_DTYPE = "string[pyarrow]"
+
+TEXT_COLUMN_CANDIDATES = frozenset(['message', 'text', 'content', 'email', 'post', 'comment', 'texts_vi', 'Message'])
+LABEL_COLUMN_CANDIDATES = frozenset(['label', 'class', 'category', 'type', 'Category'])
+
+# pyarrow CSV block size, streamed and parsed across threads; must exceed the longest row
+CSV_BLOCK_SIZE = 1 << 22
+
+# Bump when preprocess_dataframe changes so cached outputs are rebuilt
+PREPROCESS_VERSION = "v2"
+
+# Labels are int8 codes indexing LABEL_NAMES from preprocessing onward
+LABEL_NAMES = ("ham", "spam")
+
+LABEL_MAPPING = {
+    '0': 'ham', '1': 'spam',
+    'ham': 'ham', 'spam': 'spam',
+    'normal': 'ham',
+    'legitimate': 'ham', 'phishing': 'spam',
+    'not_spam': 'ham', 'is_spam': 'spam'
+}
+
+
+def _find_column(
+    columns: Iterable[str],
+    candidates: FrozenSet[str],
+    substrings: Tuple[str, ...]
+) -> Optional[str]:
+    """Find the first exact candidate column, else the first whose lowercased name contains a substring"""
+    columns = list(columns)
+    exact = candidates.intersection(columns)
+    if exact:
+        return next(col for col in columns if col in exact)
+    
+    lowered = [str(col).lower() for col in columns]
+    for col, low in zip(columns, lowered):
+        if any(sub in low for sub in substrings):
+            return col
+    return None
+
+
+def _select_columns(columns: Iterable[str]) -> Tuple[str, str]:
+    """Pick the text and label columns, falling back to the first two columns"""
+    columns = list(columns)
+    
+    # Identify text column
+    text_column = _find_column(columns, TEXT_COLUMN_CANDIDATES, ('text', 'message'))
+    
+    if text_column is None:
+        text_column = columns[0]
+        logger.warning(f"Text column not found, using first column: {text_column}")
+    
+    # Identify label column
+    label_column = _find_column(columns, LABEL_COLUMN_CANDIDATES, ('label',))
+    
+    if label_column is None:
+        label_column = columns[1] if len(columns) > 1 else columns[0]
+        logger.warning(f"Label column not found, using: {label_column}")
+    
+    return text_column, label_column
+
+
+def _read_text_label_csv(path: Path) -> pd.DataFrame:
+    """Read only the text and label columns of a CSV, as Arrow-backed strings"""
+    
+    # Header only, to choose the two columns before parsing any rows
+    text_column, label_column = _select_columns(pd.read_csv(path, nrows=0).columns)
+    columns = list(dict.fromkeys([text_column, label_column]))
+    
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        # Email bodies routinely contain quoted newlines
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.string() for col in columns}
+        )
+    )
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
 
 class DataLoader:
     """Data loading utilities"""
@@ -26,7 +112,7 @@ class DataLoader:
         """Load English spam dataset from Google Drive"""
         logger.info(f"Loading English dataset from Google Drive (ID: {file_id})")
         
-        output_path = self.data_dir / f"english_data_{file_id}.csv"
+        output_path = self._english_data_path(file_id)
         
         # Download if not exists
         if not output_path.exists():
@@ -36,7 +122,7 @@ class DataLoader:
                 quiet=False
             )
         
-        df = pd.read_csv(output_path)
+        df = _read_text_label_csv(output_path)
         logger.info(f"Loaded {len(df)} English samples")
         logger.info(f"Columns: {list(df.columns)}")
         
@@ -46,7 +132,7 @@ class DataLoader:
         """Load Vietnamese spam dataset from Kaggle"""
         logger.info(f"Loading Vietnamese dataset from Kaggle: {dataset_name}")
         
-        output_path = self.data_dir / "vi_dataset.csv"
+        output_path = self._vietnamese_data_path()
         
         # Download if not exists
         if not output_path.exists():
@@ -59,7 +145,7 @@ class DataLoader:
             df.to_csv(output_path, index=False, encoding='utf-8')
             logger.info(f"Saved Vietnamese dataset to {output_path}")
         else:
-            df = pd.read_csv(output_path)
+            df = _read_text_label_csv(output_path)
             logger.info(f"Loaded Vietnamese dataset from local cache: {output_path}")
         
         logger.info(f"Loaded {len(df)} Vietnamese samples")
@@ -67,114 +153,150 @@ class DataLoader:
         
         return df
     
-    def preprocess_dataframe(self, df: pd.DataFrame) -> Tuple[List[str], List[str]]:
+    def load_english_preprocessed(self, file_id: str = "1N7rk-kfnDFIGMeX0ROVTjKh71gcgx-7R") -> Tuple[pd.Series, np.ndarray]:
+        """Load and preprocess the English dataset, reusing cached output when the raw file is unchanged"""
+        return self._load_preprocessed(
+            self._english_data_path(file_id),
+            lambda: self.load_english_data(file_id)
+        )
+    
+    def load_vietnamese_preprocessed(self, dataset_name: str = "victorhoward2/vietnamese-spam-post-in-social-network") -> Tuple[pd.Series, np.ndarray]:
+        """Load and preprocess the Vietnamese dataset, reusing cached output when the raw file is unchanged"""
+        return self._load_preprocessed(
+            self._vietnamese_data_path(),
+            lambda: self.load_vietnamese_data(dataset_name)
+        )
+    
+    def _english_data_path(self, file_id: str) -> Path:
+        """Local path of the downloaded English CSV"""
+        return self.data_dir / f"english_data_{file_id}.csv"
+    
+    def _vietnamese_data_path(self) -> Path:
+        """Local path of the downloaded Vietnamese CSV"""
+        return self.data_dir / "vi_dataset.csv"
+    
+    def _cache_key(self, raw_path: Path, version: str = PREPROCESS_VERSION) -> str:
+        """Hash the raw file's size and first MiB together with the preprocessing version"""
+        digest = hashlib.blake2b(version.encode("utf-8"))
+        digest.update(raw_path.stat().st_size.to_bytes(8, "big"))
+        with open(raw_path, "rb") as f:
+            digest.update(f.read(1 << 20))
+        return digest.hexdigest()[:16]
+    
+    def _preprocessed_cache_path(self, raw_path: Path) -> Path:
+        """Feather file holding the preprocessed output for raw_path"""
+        return self.data_dir / f"prep_{self._cache_key(raw_path)}_{PREPROCESS_VERSION}.feather"
+    
+    def _load_preprocessed(
+        self,
+        raw_path: Path,
+        load_fn: Callable[[], pd.DataFrame]
+    ) -> Tuple[pd.Series, np.ndarray]:
+        """Return cached (messages, labels) for raw_path, or load, preprocess and cache them"""
+        
+        # A cached raw file means no download; a cached result also skips parsing and cleaning
+        if raw_path.exists():
+            cache_path = self._preprocessed_cache_path(raw_path)
+            if cache_path.exists():
+                df = pd.read_feather(cache_path)
+                logger.info(f"Loaded {len(df)} preprocessed samples from cache: {cache_path}")
+                return df['message'], df['label'].to_numpy(dtype=np.int8)
+        
+        messages, labels = self.preprocess_dataframe(load_fn())
+        
+        cache_path = self._preprocessed_cache_path(raw_path)
+        pd.DataFrame({'message': messages, 'label': labels}).to_feather(cache_path)
+        logger.info(f"Cached preprocessed dataset to {cache_path}")
+        
+        return messages, labels
+    
+    def preprocess_dataframe(self, df: pd.DataFrame) -> Tuple[pd.Series, np.ndarray]:
         """
         Preprocess dataframe to extract messages and labels
         Handles various column name formats
         """
         logger.info("Preprocessing dataframe...")
         
-        # Identify text column
-        text_column = None
-        text_candidates = ['message', 'text', 'content', 'email', 'post', 'comment', 'texts_vi', 'Message']
-        for col in df.columns:
-            if col in text_candidates or 'text' in col.lower() or 'message' in col.lower():
-                text_column = col
-                break
-        
-        if text_column is None:
-            text_column = df.columns[0]
-            logger.warning(f"Text column not found, using first column: {text_column}")
-        
-        # Identify label column
-        label_column = None
-        label_candidates = ['label', 'class', 'category', 'type', 'Category']
-        for col in df.columns:
-            if col in label_candidates or 'label' in col.lower():
-                label_column = col
-                break
-        
-        if label_column is None:
-            label_column = df.columns[1] if len(df.columns) > 1 else df.columns[0]
-            logger.warning(f"Label column not found, using: {label_column}")
+        text_column, label_column = _select_columns(df.columns)
         
         logger.info(f"Using text column: {text_column}")
         logger.info(f"Using label column: {label_column}")
         
-        # Clean text data
-        df[text_column] = df[text_column].astype(str).fillna('')
-        df = df[df[text_column].str.strip() != '']
+        # Clean text data, dropping missing and blank messages
+        messages = df[text_column].astype(TEXT_DTYPE).fillna('').str.strip()
+        keep = messages.str.len() > 0
         
-        # Clean labels - convert to ham/spam
-        df[label_column] = df[label_column].astype(str).str.lower()
+        # Clean labels - convert to ham/spam codes; unrecognised labels become -1
+        labels = df[label_column].astype(TEXT_DTYPE).str.lower()
+        labels = labels.map(LABEL_MAPPING).fillna(labels)
+        codes = pd.Categorical(labels, categories=LABEL_NAMES).codes.astype(np.int8)
         
-        label_mapping = {
-            '0': 'ham', '1': 'spam',
-            'ham': 'ham', 'spam': 'spam',
-            'normal': 'ham', 'spam': 'spam',
-            'legitimate': 'ham', 'phishing': 'spam',
-            'not_spam': 'ham', 'is_spam': 'spam'
-        }
+        unknown = keep & (codes < 0)
+        if unknown.any():
+            logger.warning(f"Dropping {int(unknown.sum())} samples with unrecognised labels")
+        keep = (keep & (codes >= 0)).to_numpy(dtype=bool)
         
-        df[label_column] = df[label_column].map(label_mapping).fillna(df[label_column])
+        messages = messages[keep].reset_index(drop=True)
+        labels = codes[keep]
         
         # Show distribution
-        label_counts = df[label_column].value_counts()
         logger.info(f"Label distribution:")
-        for label, count in label_counts.items():
+        for label, count in zip(LABEL_NAMES, np.bincount(labels, minlength=len(LABEL_NAMES))):
             logger.info(f"  {label}: {count} samples")
         
-        messages = df[text_column].tolist()
-        labels = df[label_column].tolist()
-        
         logger.info(f"Preprocessed {len(messages)} messages")
         
         return messages, labels
     
     def combine_datasets(
         self,
-        english_messages: List[str],
-        english_labels: List[str],
-        vietnamese_messages: List[str],
-        vietnamese_labels: List[str]
-    ) -> Tuple[List[str], List[str]]:
+        english_messages: pd.Series,
+        english_labels: np.ndarray,
+        vietnamese_messages: pd.Series,
+        vietnamese_labels: np.ndarray
+    ) -> Tuple[pd.Series, np.ndarray]:
         """Combine English and Vietnamese datasets"""
         
         logger.info("Combining datasets...")
         
-        all_messages = english_messages + vietnamese_messages
-        all_labels = english_labels + vietnamese_labels
+        all_messages = pd.concat(
+            [pd.Series(english_messages, dtype=TEXT_DTYPE), pd.Series(vietnamese_messages, dtype=TEXT_DTYPE)],
+            ignore_index=True
+        )
+        all_labels = np.concatenate([
+            np.asarray(english_labels, dtype=np.int8), np.asarray(vietnamese_labels, dtype=np.int8)
+        ])
         
         logger.info(f"Combined dataset: {len(all_messages)} total samples")
         logger.info(f"  English: {len(english_messages)} samples")
         logger.info(f"  Vietnamese: {len(vietnamese_messages)} samples")
         
         # Show combined distribution
-        from collections import Counter
-        label_counts = Counter(all_labels)
+        label_counts = np.bincount(all_labels, minlength=len(LABEL_NAMES))
         logger.info("Combined label distribution:")
-        for label, count in label_counts.items():
+        for label, count in zip(LABEL_NAMES, label_counts):
             logger.info(f"  {label}: {count} samples ({count/len(all_labels)*100:.1f}%)")
         
         return all_messages, all_labels
 
     def save_combined_data(
         self,
-        messages: List[str],
-        labels: List[str],
+        messages: pd.Series,
+        labels: np.ndarray,
         output_path: str = None
     ):
-        """Save combined dataset to CSV"""
+        """Save combined dataset to Feather"""
         
         if output_path is None:
-            output_path = self.data_dir / "combined_dataset.csv"
+            output_path = self.data_dir / "combined_dataset.feather"
         
         df = pd.DataFrame({
             'message': messages,
             'label': labels
         })
         
-        df.to_csv(output_path, index=False, encoding='utf-8')
+        # Binary Arrow IPC: no text encoding on write or parsing on read
+        df.to_feather(output_path)
         logger.info(f"Saved combined dataset to {output_path}")
         
         return output_path
@@ -186,12 +308,10 @@ def main():
     loader = DataLoader(data_dir="data")
     
     # Load English data
-    df_english = loader.load_english_data()
-    english_messages, english_labels = loader.preprocess_dataframe(df_english)
+    english_messages, english_labels = loader.load_english_preprocessed()
     
     # Load Vietnamese data
-    df_vietnamese = loader.load_vietnamese_data()
-    vietnamese_messages, vietnamese_labels = loader.preprocess_dataframe(df_vietnamese)
+    vietnamese_messages, vietnamese_labels = loader.load_vietnamese_preprocessed()
     
     # Combine datasets
     all_messages, all_labels = loader.combine_datasets(
@@ -7,11 +7,14 @@ import sys
 from pathlib import Path
 import logging
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from data_loader import DataLoader
+from data_loader import DataLoader, LABEL_NAMES, TEXT_DTYPE
 from augmentation import DataAugmentor
 from train_model import ModelTrainer
 
@@ -43,19 +46,23 @@ def run_complete_pipeline(
     logger.info("\n[STEP 1] Loading datasets...")
     loader = DataLoader(data_dir=str(DATA_DIR))
     
-    try:
-        df_english = loader.load_english_data()
-        english_messages, english_labels = loader.preprocess_dataframe(df_english)
-    except Exception as e:
-        logger.error(f"Failed to load English data: {e}")
-        return
-    
-    try:
-        df_vietnamese = loader.load_vietnamese_data()
-        vietnamese_messages, vietnamese_labels = loader.preprocess_dataframe(df_vietnamese)
-    except Exception as e:
-        logger.warning(f"Failed to load Vietnamese data: {e}")
-        vietnamese_messages, vietnamese_labels = [], []
+    # Both downloads are network-bound and independent, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        english_future = executor.submit(loader.load_english_preprocessed)
+        vietnamese_future = executor.submit(loader.load_vietnamese_preprocessed)
+        
+        try:
+            english_messages, english_labels = english_future.result()
+        except Exception as e:
+            logger.error(f"Failed to load English data: {e}")
+            return
+        
+        try:
+            vietnamese_messages, vietnamese_labels = vietnamese_future.result()
+        except Exception as e:
+            logger.warning(f"Failed to load Vietnamese data: {e}")
+            vietnamese_messages = pd.Series([], dtype=TEXT_DTYPE)
+            vietnamese_labels = np.empty(0, dtype=np.int8)
     
     # Combine datasets
     all_messages, all_labels = loader.combine_datasets(
@@ -71,16 +78,18 @@ def run_complete_pipeline(
         logger.info("\n[STEP 2] Augmenting data...")
         augmentor = DataAugmentor(data_dir=str(DATA_DIR))
         
+        # The augmentor works on label names; convert codes at this boundary
         aug_messages, aug_labels = augmentor.augment_dataset(
-            all_messages, all_labels,
+            all_messages, np.asarray(LABEL_NAMES)[all_labels].tolist(),
             aug_ratio=aug_ratio,
             alpha=alpha
         )
         
         # Combine original + augmented
         original_count = len(all_messages)
-        all_messages.extend(aug_messages)
-        all_labels.extend(aug_labels)
+        all_messages = pd.concat([all_messages, pd.Series(aug_messages, dtype=TEXT_DTYPE)], ignore_index=True)
+        aug_codes = pd.Categorical(aug_labels, categories=LABEL_NAMES).codes.astype(np.int8)
+        all_labels = np.concatenate([all_labels, aug_codes])
         
         logger.info(f"Dataset expanded: {original_count} → {len(all_messages)} samples")
     else:
@@ -89,7 +98,8 @@ def run_complete_pipeline(
     # Step 3: Train model
     logger.info("\n[STEP 3] Training model...")
     trainer = ModelTrainer(output_dir=str(ARTIFACTS_DIR))
-    config = trainer.train(all_messages, all_labels, test_size=test_size)
+    # The tokenizer expects a plain list of strings
+    config = trainer.train(all_messages.tolist(), all_labels, test_size=test_size)
     
     # Step 4: Summary
     logger.info("\n" + "="*60)
@@ -7,20 +7,44 @@ import torch
 import torch.nn.functional as F
 from transformers import AutoTokenizer, AutoModel
 import faiss
+import lmdb
 import numpy as np
-import json
 import logging
+import orjson
+import os
 from pathlib import Path
-from sklearn.model_selection import train_test_split
-from collections import Counter
 from tqdm import tqdm
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import pandas as pd
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Index used once there are enough vectors to train 4096 IVF lists (~39 points per list)
+IVFPQ_INDEX_FACTORY = "OPQ64,IVF4096_HNSW32,PQ64"
+IVFPQ_MIN_TRAIN_SAMPLES = 39 * 4096
+# Exhaustive search is cheap enough up to this many vectors
+FLAT_MAX_SAMPLES = 5000
+# Inverted lists probed per query by the IVF tier between the two
+IVF_NPROBE = 16
+# Vector codec below the IVF-PQ tier: 8-bit scalar quantization (1 byte per dimension)
+SMALL_INDEX_ENCODING = "SQ8"
+
+# Memory-mapped embedding matrix written during training, removed once split
+EMBEDDINGS_SCRATCH_FILE = "embeddings.f32"
+
+# Labels are int8 codes indexing LABEL_NAMES (as produced by data_loader.py);
+# the names are saved once in model_config.json
+LABEL_NAMES = ("ham", "spam")
+
+# LMDB metadata layout read by backend/app/services/metadata_store.py
+LMDB_LABELS_DB = b"labels"
+LMDB_MESSAGES_DB = b"messages"
+
+# JSON artifacts: numpy scalars (alpha, accuracies) serialize directly; keep them readable
+JSON_DUMP_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+
 
 class ModelTrainer:
     """Spam classification model trainer"""
@@ -28,7 +52,8 @@ class ModelTrainer:
     def __init__(
         self,
         model_name: str = "intfloat/multilingual-e5-base",
-        output_dir: str = "artifacts"
+        output_dir: str = "artifacts",
+        compile_model: bool = True
     ):
         self.model_name = model_name
         self.output_dir = Path(output_dir)
@@ -37,13 +62,25 @@ class ModelTrainer:
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Using device: {self.device}")
         
+        # Index training, adds and searches parallelize across cores
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
+        
         # Load model
         logger.info(f"Loading model: {model_name}")
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModel.from_pretrained(model_name)
-        self.model = self.model.to(self.device)
+        
+        # Half precision on GPU: tensor-core matmuls and half the memory traffic
+        self.dtype = torch.float32
+        if self.device.type == "cuda":
+            self.dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        self.model = self.model.to(self.device, dtype=self.dtype)
         self.model.eval()
         
+        if compile_model and self.device.type == "cuda":
+            logger.info("Compiling model with torch.compile")
+            self.model = torch.compile(self.model, mode="reduce-overhead")
+        
     def average_pool(self, last_hidden_states, attention_mask):
         """Average pooling for embeddings"""
         last_hidden = last_hidden_states.masked_fill(
@@ -55,40 +92,103 @@ class ModelTrainer:
         self,
         texts: List[str],
         batch_size: int = 32,
-        prefix: str = "passage"
+        prefix: str = "passage",
+        output_path: Optional[Path] = None
     ) -> np.ndarray:
-        """Generate embeddings for texts"""
-        
-        embeddings = []
+        """Generate embeddings for texts into a memory-mapped float32 file"""
+        
+        # Tokenize everything once; batches below are padded from these ids
+        encodings = self.tokenizer(
+            [f"{prefix}: {text}" for text in texts],
+            max_length=512,
+            truncation=True,
+            return_length=True
+        )
+        lengths = encodings.pop("length")
+        
+        # Batch similar-length texts together so little of each batch is padding
+        order = np.argsort(lengths, kind="stable")
+        
+        # Write batches straight into a disk-backed array instead of stacking at the end,
+        # so the full matrix never has to sit in RAM more than once
+        if output_path is None:
+            output_path = self.output_dir / EMBEDDINGS_SCRATCH_FILE
+        embeddings = np.memmap(
+            output_path, dtype=np.float32, mode="w+",
+            shape=(len(texts), self.model.config.hidden_size)
+        )
         
-        for i in tqdm(range(0, len(texts), batch_size), desc=f"Generating {prefix} embeddings"):
-            batch_texts = texts[i:i+batch_size]
-            batch_texts_with_prefix = [f"{prefix}: {text}" for text in batch_texts]
-            
-            batch_dict = self.tokenizer(
-                batch_texts_with_prefix,
-                max_length=512,
-                padding=True,
-                truncation=True,
+        batch_orders = [order[i:i+batch_size] for i in range(0, len(texts), batch_size)]
+        host_batches = (
+            self.tokenizer.pad(
+                {k: [v[j] for j in batch_order] for k, v in encodings.items()},
+                padding="longest",
+                pad_to_multiple_of=8,
                 return_tensors="pt"
             )
-            batch_dict = {k: v.to(self.device) for k, v in batch_dict.items()}
-            
-            with torch.no_grad():
+            for batch_order in batch_orders
+        )
+        
+        for batch_order, batch_dict in tqdm(
+            zip(batch_orders, self._prefetch_to_device(host_batches)),
+            total=len(batch_orders),
+            desc=f"Generating {prefix} embeddings"
+        ):
+            with torch.inference_mode(), torch.autocast(
+                device_type=self.device.type, dtype=self.dtype, enabled=self.device.type == "cuda"
+            ):
                 outputs = self.model(**batch_dict)
                 batch_embeddings = self.average_pool(
                     outputs.last_hidden_state,
                     batch_dict["attention_mask"]
                 )
-                batch_embeddings = F.normalize(batch_embeddings, p=2, dim=1)
-                embeddings.append(batch_embeddings.cpu().numpy())
+                # FAISS needs float32
+                batch_embeddings = F.normalize(batch_embeddings.float(), p=2, dim=1)
+                # Scatter back so rows follow the input order
+                embeddings[batch_order] = batch_embeddings.cpu().numpy()
         
-        return np.vstack(embeddings)
+        embeddings.flush()
+        return embeddings
     
-    def calculate_class_weights(self, labels: List[str]) -> Dict[str, float]:
-        """Calculate class weights for imbalanced data"""
+    def _prefetch_to_device(
+        self,
+        batches: Iterable[Dict[str, torch.Tensor]]
+    ) -> Iterator[Dict[str, torch.Tensor]]:
+        """Yield batches on the device; on CUDA the next batch is uploaded on a side stream during compute"""
+        
+        if self.device.type != "cuda":
+            for batch in batches:
+                yield {k: v.to(self.device) for k, v in batch.items()}
+            return
+        
+        copy_stream = torch.cuda.Stream()
+        
+        def upload(batch):
+            with torch.cuda.stream(copy_stream):
+                return {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in batch.items()}
+        
+        batches = iter(batches)
+        next_batch = next(batches, None)
+        pending = upload(next_batch) if next_batch is not None else None
+        
+        while pending is not None:
+            # Compute must not start before the batch's copy has finished
+            compute_stream = torch.cuda.current_stream()
+            compute_stream.wait_stream(copy_stream)
+            current = pending
+            for v in current.values():
+                v.record_stream(compute_stream)
+            
+            # Start uploading the following batch before handing this one out
+            next_batch = next(batches, None)
+            pending = upload(next_batch) if next_batch is not None else None
+            yield current
+    
+    def calculate_class_weights(self, labels: np.ndarray) -> Dict[str, float]:
+        """Calculate class weights for imbalanced data, keyed by label name"""
         
-        label_counts = Counter(labels)
+        counts = np.bincount(labels, minlength=len(LABEL_NAMES))
+        label_counts = {LABEL_NAMES[code]: int(count) for code, count in enumerate(counts) if count > 0}
         total_samples = len(labels)
         num_classes = len(label_counts)
         
@@ -102,26 +202,94 @@ class ModelTrainer:
         
         return class_weights
     
-    def build_faiss_index(self, embeddings: np.ndarray) -> faiss.Index:
+    def stratified_split(
+        self,
+        labels: np.ndarray,
+        test_size: float,
+        seed: int = 42
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Split row positions into train/test, keeping each class's share in both"""
+        
+        rng = np.random.default_rng(seed)
+        test_parts = []
+        for code in np.unique(labels):
+            class_idx = np.flatnonzero(labels == code)
+            rng.shuffle(class_idx)
+            test_parts.append(class_idx[:int(round(test_size * len(class_idx)))])
+        
+        # Sorted positions keep reads from the memory-mapped embeddings sequential
+        test_idx = np.sort(np.concatenate(test_parts))
+        train_idx = np.setdiff1d(np.arange(len(labels)), test_idx, assume_unique=True)
+        return train_idx, test_idx
+    
+    def choose_index_factory(self, num_vectors: int) -> str:
+        """Pick a FAISS index factory string for the corpus size"""
+        
+        if num_vectors <= FLAT_MAX_SAMPLES:
+            return SMALL_INDEX_ENCODING
+        if num_vectors < IVFPQ_MIN_TRAIN_SAMPLES:
+            nlist = int(4 * np.sqrt(num_vectors))
+            return f"IVF{nlist},{SMALL_INDEX_ENCODING}"
+        return IVFPQ_INDEX_FACTORY
+    
+    def build_faiss_index(
+        self,
+        embeddings: np.ndarray,
+        index_factory: Optional[str] = None
+    ) -> faiss.Index:
         """Build FAISS index for similarity search"""
         
-        dimension = embeddings.shape[1]
-        logger.info(f"Building FAISS index with dimension {dimension}")
+        num_vectors, dimension = embeddings.shape
+        if index_factory is None:
+            index_factory = self.choose_index_factory(num_vectors)
+        logger.info(f"Building FAISS index '{index_factory}' with dimension {dimension}")
+        
+        embeddings = embeddings.astype("float32")
+        index = faiss.index_factory(dimension, index_factory, faiss.METRIC_INNER_PRODUCT)  # Inner product (cosine similarity)
+        if not index.is_trained:
+            logger.info(f"Training FAISS index on {num_vectors} vectors")
+            index.train(embeddings)
+        index.add(embeddings)
         
-        index = faiss.IndexFlatIP(dimension)  # Inner product (cosine similarity)
-        index.add(embeddings.astype("float32"))
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            ivf_index.nprobe = IVF_NPROBE
         
         logger.info(f"FAISS index built with {index.ntotal} vectors")
         
         return index
     
+    def save_metadata_lmdb(self, metadata: List[Dict], path: Path):
+        """Save metadata to LMDB keyed by FAISS id for on-demand lookup"""
+        
+        # Generous upper bound on the memory map size (file is sparse)
+        data_size = sum(len(m["message"].encode("utf-8")) + 1 for m in metadata)
+        map_size = 3 * (data_size + 64 * len(metadata)) + (64 << 20)
+        
+        env = lmdb.open(str(path), map_size=map_size, max_dbs=2)
+        labels_db = env.open_db(LMDB_LABELS_DB)
+        messages_db = env.open_db(LMDB_MESSAGES_DB)
+        
+        with env.begin(write=True) as txn:
+            txn.drop(labels_db, delete=False)
+            txn.drop(messages_db, delete=False)
+            # Keys are 8-byte big-endian ids so cursor order equals FAISS id order
+            for i, m in enumerate(metadata):
+                key = i.to_bytes(8, "big")
+                # One byte per label code
+                txn.put(key, bytes([m["label"]]), db=labels_db, append=True)
+                txn.put(key, m["message"].encode("utf-8"), db=messages_db, append=True)
+        env.close()
+        
+        logger.info(f"Saved {len(metadata)} metadata records to {path}")
+    
     def optimize_alpha(
         self,
         test_embeddings: np.ndarray,
         test_metadata: List[Dict],
         index: faiss.Index,
         train_metadata: List[Dict],
-        class_weights: Dict[str, float],
+        class_weight_array: np.ndarray,
         k: int = 10
     ) -> Tuple[float, List[Tuple[float, float]]]:
         """Find optimal alpha parameter"""
@@ -133,35 +301,38 @@ class ModelTrainer:
         best_accuracy = 0.0
         alpha_results = []
         
+        # Neighbors don't depend on alpha: search all test queries once
+        scores_all, indices_all = index.search(test_embeddings.astype("float32"), k)
+        
+        # Label codes (0 = ham, 1 = spam) as arrays
+        labels_array = np.fromiter((m["label"] for m in train_metadata), dtype=np.int8, count=len(train_metadata))
+        true_array = np.fromiter((m["label"] for m in test_metadata), dtype=np.int8, count=len(test_metadata))
+        
+        # Approximate indexes pad with -1 when fewer than k neighbors are found;
+        # those slots get a zero mask so they add nothing to either class
+        valid = indices_all >= 0
+        neighbor_labels = labels_array[np.where(valid, indices_all, 0)]
+        ham_mask = (valid & (neighbor_labels == 0)).astype(np.float32)
+        spam_mask = (valid & (neighbor_labels == 1)).astype(np.float32)
+        
+        # Quick saliency
+        saliency_weight = 0.5  # Default
+        
+        # Per-class votes are linear in alpha: score = (1 - alpha) * A + alpha * B,
+        # with A the summed similarity x class weight and B the summed saliency
+        weighted_sims = np.where(valid, scores_all, 0) * class_weight_array[neighbor_labels]
+        a_ham = (weighted_sims * ham_mask).sum(axis=1)
+        a_spam = (weighted_sims * spam_mask).sum(axis=1)
+        b_ham = saliency_weight * ham_mask.sum(axis=1)
+        b_spam = saliency_weight * spam_mask.sum(axis=1)
+        
         for alpha in alpha_values:
-            correct = 0
-            total = len(test_embeddings)
+            # One comparison per test row instead of re-weighting all k neighbors
+            ham_score = (1 - alpha) * a_ham + alpha * b_ham
+            spam_score = (1 - alpha) * a_spam + alpha * b_spam
             
-            for i in range(total):
-                query_embedding = test_embeddings[i:i+1].astype("float32")
-                true_label = test_metadata[i]["label"]
-                
-                scores, indices = index.search(query_embedding, k)
-                
-                # Quick saliency
-                saliency_weight = 0.5  # Default
-                
-                # Weighted voting
-                vote_scores = {"ham": 0.0, "spam": 0.0}
-                for j in range(k):
-                    neighbor_idx = indices[0][j]
-                    similarity = float(scores[0][j])
-                    neighbor_label = train_metadata[neighbor_idx]["label"]
-                    
-                    weight = (1 - alpha) * similarity * class_weights[neighbor_label] + alpha * saliency_weight
-                    vote_scores[neighbor_label] += weight
-                
-                predicted_label = max(vote_scores, key=vote_scores.get)
-                
-                if predicted_label == true_label:
-                    correct += 1
-            
-            accuracy = correct / total
+            correct = int(((spam_score > ham_score) == true_array).sum())
+            accuracy = correct / len(test_embeddings)
             alpha_results.append((alpha, accuracy))
             
             if accuracy > best_accuracy:
@@ -176,7 +347,7 @@ class ModelTrainer:
     def train(
         self,
         messages: List[str],
-        labels: List[str],
+        labels: np.ndarray,
         test_size: float = 0.2
     ) -> Dict:
         """Complete training pipeline"""
@@ -188,38 +359,42 @@ class ModelTrainer:
         embeddings = self.generate_embeddings(messages)
         
         # Create metadata
+        labels = np.asarray(labels, dtype=np.int8)
         metadata = [
             {
                 "index": i,
                 "message": message,
                 "label": label
             }
-            for i, (message, label) in enumerate(zip(messages, labels))
+            for i, (message, label) in enumerate(zip(messages, labels.tolist()))
         ]
         
         # Train-test split
         logger.info("Splitting data...")
-        X_train, X_test, meta_train, meta_test = train_test_split(
-            embeddings,
-            metadata,
-            test_size=test_size,
-            random_state=42,
-            stratify=[m["label"] for m in metadata]
-        )
+        train_idx, test_idx = self.stratified_split(labels, test_size)
+        X_train, X_test = embeddings[train_idx], embeddings[test_idx]
+        meta_train = [metadata[i] for i in train_idx.tolist()]
+        meta_test = [metadata[i] for i in test_idx.tolist()]
         
         logger.info(f"Train: {len(X_train)} samples")
         logger.info(f"Test: {len(X_test)} samples")
         
+        # The splits are in-memory copies; drop the memory-mapped scratch file
+        embedding_dim = embeddings.shape[1]
+        del embeddings
+        (self.output_dir / EMBEDDINGS_SCRATCH_FILE).unlink(missing_ok=True)
+        
         # Calculate class weights
-        train_labels = [m["label"] for m in meta_train]
-        class_weights = self.calculate_class_weights(train_labels)
+        class_weights = self.calculate_class_weights(labels[train_idx])
+        # Dense weights indexed by label code, gathered per neighbor while voting
+        class_weight_array = np.array([class_weights[name] for name in LABEL_NAMES], dtype=np.float32)
         
         # Build FAISS index
         index = self.build_faiss_index(X_train)
         
         # Optimize alpha
         best_alpha, alpha_results = self.optimize_alpha(
-            X_test, meta_test, index, meta_train, class_weights
+            X_test, meta_test, index, meta_train, class_weight_array
         )
         
         # Save artifacts
@@ -229,12 +404,14 @@ class ModelTrainer:
         faiss.write_index(index, str(self.output_dir / "faiss_index.bin"))
         
         # Save metadata
-        with open(self.output_dir / "train_metadata.json", 'w', encoding='utf-8') as f:
-            json.dump(meta_train, f, ensure_ascii=False, indent=2)
+        pd.DataFrame(meta_train).astype({"label": np.int8}).to_parquet(
+            self.output_dir / "train_metadata.parquet", compression="zstd", index=False
+        )
+        self.save_metadata_lmdb(meta_train, self.output_dir / "train_metadata.lmdb")
         
         # Save class weights
-        with open(self.output_dir / "class_weights.json", 'w', encoding='utf-8') as f:
-            json.dump(class_weights, f, indent=2)
+        with open(self.output_dir / "class_weights.json", 'wb') as f:
+            f.write(orjson.dumps(class_weights, option=JSON_DUMP_OPTIONS))
         
         # Save config
         config = {
@@ -243,12 +420,13 @@ class ModelTrainer:
             "alpha_results": alpha_results,
             "train_samples": len(X_train),
             "test_samples": len(X_test),
-            "embedding_dim": embeddings.shape[1],
+            "embedding_dim": embedding_dim,
+            "label_names": list(LABEL_NAMES),
             "trained_at": datetime.now().isoformat()
         }
         
-        with open(self.output_dir / "model_config.json", 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2)
+        with open(self.output_dir / "model_config.json", 'wb') as f:
+            f.write(orjson.dumps(config, option=JSON_DUMP_OPTIONS))
         
         logger.info(f"Artifacts saved to {self.output_dir}")
         
@@ -258,10 +436,10 @@ class ModelTrainer:
 def main():
     """Main training script"""
     
-    # Load data (assuming combined_dataset.csv exists)
-    df = pd.read_csv("data/combined_dataset.csv")
+    # Load data (assuming combined_dataset.feather exists)
+    df = pd.read_feather("data/combined_dataset.feather")
     messages = df['message'].tolist()
-    labels = df['label'].tolist()
+    labels = df['label'].to_numpy(dtype=np.int8)
     
     logger.info(f"Loaded {len(messages)} samples")
     